@@ -43,5 +43,5 @@ setup(
   package_dir = {"": "src"},
   packages = find_packages("src"),
   package_data = {"": ["**"]},
-  install_requires = ["pygame"], 
+  install_requires = ["pygame", "numpy"], 
 )
@@ -1,6 +1,12 @@
 # You can use any other library that includes standard Vector things
 from pygame import Vector2
+from bisect import bisect_right
+from functools import reduce
+from inspect import signature
+from itertools import repeat
+from operator import add, attrgetter, mul, truediv
 import math
+import numpy as np
 
 
 def advance_on_circle(radius: float, chord: float, fallback: float=math.tau) -> float:
@@ -8,6 +14,13 @@ def advance_on_circle(radius: float, chord: float, fallback: float=math.tau) ->
   if not -1 <= alpha <=1: return fallback
   return 2 * math.asin(alpha)
 
+def advance_on_circle_sum(radius: float, chords: list[float], initial: float=0) -> float:
+  """Same as adding :py:func:`advance_on_circle` for every chord one by one to 'initial' (same rounding), but looping in C"""
+  alphas = list(map(truediv, chords, repeat(2*radius)))
+  if alphas and max(map(abs, alphas)) > 1:
+    return reduce(add, (advance_on_circle(radius, chord) for chord in chords), initial)
+  return reduce(add, map(mul, repeat(2), map(math.asin, alphas)), initial)
+
 def Vector2_polar(magnitude: float, angle_rad: float) -> Vector2:
   return magnitude * Vector2(math.cos(angle_rad), math.sin(angle_rad))
 
@@ -19,8 +32,40 @@ def get_edge_angle(radius: float, distance: float, fallback: float=0) -> float:
 
 class ArcFollowRing:
   def __init__(self):
-    self.radius = 1
-    self.angles: list[float] = []
+    self.__radius = 1
+    self.__angles: list[float] = []
+    # Checkpoint to resume the layout from this ring
+    self.start = 0 # Index of the first follower
+    self.total_radius = 0 # Radius inside the ring
+    # Caches
+    self.__offsets: np.ndarray|None = None
+
+  @property
+  def radius(self) -> float:
+    return self.__radius
+
+  @radius.setter
+  def radius(self, value: float):
+    self.__radius = value
+    self.__offsets = None
+
+  @property
+  def angles(self) -> list[float]:
+    """Angles of the followers in the ring. Assign a new list to change them, it's not watched in place"""
+    return self.__angles
+
+  @angles.setter
+  def angles(self, value: list[float]):
+    self.__angles = value
+    self.__offsets = None
+
+  @property
+  def offsets(self) -> np.ndarray:
+    """Read-only: Offsets of the followers from the leader (shape (n, 2)), before the rotation"""
+    if self.__offsets is None:
+      angles = np.array(self.__angles, float)
+      self.__offsets = self.__radius * np.stack((np.cos(angles), np.sin(angles)), 1)
+    return self.__offsets
 
 
 class ArcFollowElement:
@@ -46,10 +91,17 @@ class ArcFollow:
     self.rotation = 0
     self.strong = strong
     self.uniform = uniform
+    self.__clamp_parameters() # Followers are added without a full layout, which also clamps
     self.__last_max_angle = self.max_angle
     self.__last_gap = self.gap
     self.__last_spacing = self.spacing
     self.__total_size = 0
+    self.__changed: int|None = None # First follower added or removed since the last layout
+    # Caches
+    self.__ring_offsets: list[np.ndarray] = []
+    self.__offsets = np.empty((0, 2))
+    self.__rotated: np.ndarray|None = None
+    self.__rotated_by = 0
 
   @property
   def max_angle_deg(self) -> float:
@@ -74,23 +126,47 @@ class ArcFollow:
     self.leader.pos = new_pos
     
     # Update followers
-    i = 0
-    for ring in self.rings:
-      for angle in ring.angles:
-        self.followers[i].pos = self.leader.pos + Vector2_polar(ring.radius, angle + self.rotation)
-        i += 1
+    positions = self.get_offsets() + self.leader.pos
+    for follower, (x, y) in zip(self.followers, positions.tolist()):
+      follower.pos = Vector2(x, y)
+
+  def get_offsets(self) -> np.ndarray:
+    """Offsets of every follower from the leader, rotated again only when the rotation or a ring changed"""
+    ring_offsets = [ring.offsets for ring in self.rings]
+    if len(ring_offsets) != len(self.__ring_offsets) or any(map(
+      lambda new, old: new is not old, ring_offsets, self.__ring_offsets
+    )):
+      self.__ring_offsets = ring_offsets
+      self.__offsets = np.concatenate(ring_offsets) if ring_offsets else np.empty((0, 2))
+      self.__rotated = None
+
+    if self.__rotated is None or self.rotation != self.__rotated_by:
+      cos, sin = math.cos(self.rotation), math.sin(self.rotation)
+      self.__rotated = self.__offsets @ np.array(((cos, sin), (-sin, cos)))
+      self.__rotated_by = self.rotation
+    return self.__rotated
   
-  def adapt_rings(self):
-    """Update arcs and follower placement"""
+  def adapt_rings(self, start: int=0):
+    """
+    Update arcs and follower placement
+
+    :param start: index of the first changed follower, rings before it are kept
+    """
+    ring_i, first, total_radius = self.get_checkpoint(start)
     # Caches
-    to_add = [f.size for f in self.followers]
+    to_add = [f.size for f in self.followers[first:]]
     chords = [to_add[i] + self.spacing + to_add[i+1] for i in range(len(to_add)-1)] 
     
-    ring_i = start_i = last_biggest = 0
+    start_i = last_biggest = 0
     end_i = -1
-    total_radius = max(1, self.gap + self.leader.size)
-    biggest = to_add[0]
-    angle = get_edge_angle(total_radius + biggest, to_add[start_i])
+    exact = True # When False, 'angle' was summed with smaller radii, so it's only an upper bound
+    edge_start = ring_i == 0 # Whether 'angle' starts with the edge angle of the first follower
+    if to_add:
+      biggest = to_add[0]
+      if ring_i == 0:
+        angle = get_edge_angle(total_radius + biggest, to_add[start_i])
+      else:
+        angle = advance_on_circle(total_radius + biggest, to_add[start_i])
     
     while end_i < len(to_add) - 1:
       end_i += 1
@@ -102,10 +178,13 @@ class ArcFollow:
         biggest = size
         new_radius = total_radius + biggest
         
-        # Recalculate previous angles
-        angle = get_edge_angle(new_radius, to_add[start_i])
-        for i in range(start_i, end_i - 1):
-          angle += advance_on_circle(new_radius, chords[i])
+        if edge_start:
+          # Previous angles shrink, they are recalculated only if the arc may be full
+          exact = False
+        else:
+          # The first angle changes of formula, so it's not a bound, recalculate previous angles (once per ring)
+          angle = advance_on_circle_sum(new_radius, chords[start_i:end_i-1], get_edge_angle(new_radius, to_add[start_i]))
+          edge_start = True
       
       if end_i - start_i >= 1:
         angle += advance_on_circle(new_radius, chords[end_i-1])
@@ -115,6 +194,15 @@ class ArcFollow:
         and angle + get_edge_angle(new_radius, to_add[end_i]) > self.max_angle
       )
       
+      if not exact and (overfits or end_i >= len(to_add) - 1):
+        # Recalculate previous angles
+        angle = advance_on_circle_sum(new_radius, chords[start_i:end_i], get_edge_angle(new_radius, to_add[start_i]))
+        exact = True
+        overfits = (
+          end_i - start_i > 0
+          and angle + get_edge_angle(new_radius, to_add[end_i]) > self.max_angle
+        )
+      
       if overfits or end_i >= len(to_add) - 1:
         if overfits:
           # Remove the follower who is overflowing
@@ -123,9 +211,7 @@ class ArcFollow:
           if to_add[end_i+1] > size: # Don't use min() it won't work in every case
             biggest = last_biggest
             new_radius = total_radius + biggest
-            angle = advance_on_circle(new_radius, to_add[start_i])
-            for i in range(start_i, end_i - 1):
-              angle += advance_on_circle(new_radius, chords[i])
+            angle = advance_on_circle_sum(new_radius, chords[start_i:end_i-1], advance_on_circle(new_radius, to_add[start_i]))
           elif end_i - start_i >= 0:
             angle -= advance_on_circle(new_radius, chords[end_i])
         
@@ -133,6 +219,8 @@ class ArcFollow:
         
         # Create the new ring with every selected followers
         ring = self.get_ring(ring_i)
+        ring.start = first + start_i
+        ring.total_radius = total_radius
         
         # Choose ring radius
         if self.strong and start_i == end_i and 2*get_edge_angle(new_radius, to_add[end_i]) > self.max_angle:
@@ -145,13 +233,15 @@ class ArcFollow:
           ring.angles = [self.max_angle/2]
         elif self.uniform:
           extra = (self.max_angle - angle) / (end_i - start_i)
-          ring.angles = [get_edge_angle(new_radius, to_add[start_i])]
+          angles = [get_edge_angle(new_radius, to_add[start_i])]
           for i in range(start_i, end_i):
-            ring.angles.append(ring.angles[-1] + extra + advance_on_circle(ring.radius, chords[i]))
+            angles.append(angles[-1] + extra + advance_on_circle(ring.radius, chords[i]))
+          ring.angles = angles
         else:
-          ring.angles = [(self.max_angle - angle) / 2 + advance_on_circle(ring.radius, to_add[start_i])]
+          angles = [(self.max_angle - angle) / 2 + advance_on_circle(ring.radius, to_add[start_i])]
           for i in range(start_i, end_i):
-            ring.angles.append(ring.angles[-1] + advance_on_circle(ring.radius, chords[i]))
+            angles.append(angles[-1] + advance_on_circle(ring.radius, chords[i]))
+          ring.angles = angles
         
         # Progress
         total_radius = ring.radius + biggest + self.gap
@@ -159,6 +249,8 @@ class ArcFollow:
         
         # Clean up variables
         start_i = end_i + 1
+        exact = True
+        edge_start = False
         if start_i < len(to_add):
           biggest = to_add[start_i]
           last_biggest = 0
@@ -166,6 +258,16 @@ class ArcFollow:
     
     # Remove empty rings
     self.rings = self.rings[:ring_i]
+
+  def get_checkpoint(self, index: int) -> tuple[int, int, float]:
+    """
+    Ring to resume the layout from, when followers changed from 'index'. Return its index, first follower and inner radius.
+    A ring also depends on the follower after it (which didn't fit), so the ring of the follower before 'index' is used.
+    """
+    ring_i = bisect_right(self.rings, index - 1, key=attrgetter("start")) - 1
+    if ring_i <= 0: return 0, 0, max(1, self.gap + self.leader.size)
+    ring = self.rings[ring_i]
+    return ring_i, ring.start, ring.total_radius
   
   def check_rings(self):
     """Recalculate the rings if .max_angle, .gap, .spacing or a follower size has been changed"""
@@ -175,24 +277,47 @@ class ArcFollow:
         self.spacing != self.__last_spacing or 
         total != self.__total_size
     ):
-      self.max_angle = max(min(self.max_angle, math.tau), 0.03)
-      self.gap = max(self.gap, 1)
-      self.spacing = max(self.spacing, 0)
+      self.__clamp_parameters()
       self.__last_max_angle = self.max_angle
       self.__last_gap = self.gap
       self.__last_spacing = self.spacing
       self.__total_size = total
       self.adapt_rings()
+    elif self.__changed is not None:
+      # Only followers were added or removed, rings before them don't change
+      self.__adapt_from(self.__changed)
+    self.__changed = None
       
     if self.rotation > math.pi: self.rotation = -math.pi
     elif self.rotation < -math.pi: self.rotation = math.pi
 
+  def __clamp_parameters(self):
+    self.max_angle = max(min(self.max_angle, math.tau), 0.03)
+    self.gap = max(self.gap, 1)
+    self.spacing = max(self.spacing, 0)
+
   def add_follower(self, follower: ArcFollowElement):
     """Add a new follower"""
     self.followers.append(follower)
+    self.__total_size += follower.size
+    self.__set_changed(len(self.followers) - 1)
 
   def pop_follower(self, index: int=-1):
-    self.followers.pop(index)
+    removed = self.followers.pop(index)
+    self.__total_size -= removed.size
+    self.__set_changed(index % (len(self.followers) + 1))
+
+  def __set_changed(self, index: int):
+    self.__changed = index if self.__changed is None else min(self.__changed, index)
+
+  def __adapt_from(self, start: int):
+    """Adapt the rings from the follower at 'start', or all of them if .adapt_rings doesn't take it"""
+    try:
+      signature(self.adapt_rings).bind(start)
+    except TypeError:
+      self.adapt_rings()
+    else:
+      self.adapt_rings(start)
 
   def remove_follower(self, follower: ArcFollowElement):
     """Remove a follower of the trail"""
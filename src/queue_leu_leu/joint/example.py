@@ -40,6 +40,7 @@ class JointFollowExample(JointFollow):
     elif keys[pygame.K_RSHIFT]:
       for f in self.followers:
         f.size = random.randint(6, 60)
+      self.wake()
       return True
 
     elif keys[pygame.K_EQUALS]:
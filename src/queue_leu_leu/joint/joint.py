@@ -1,5 +1,28 @@
 # You can use any other library that includes standard Vector things
 from pygame import Vector2
+from itertools import chain
+from operator import attrgetter
+import numpy as np
+
+
+def pull_links(positions: np.ndarray, targets: np.ndarray, sizes: np.ndarray, target_sizes: np.ndarray,
+               distance: float, active: np.ndarray=None) -> np.ndarray:
+  """
+  Vectorized version of one step of :py:meth:`JointFollow.update_pos`. \n
+  Every array has one row per link, 'positions' is modified in place.
+  Return the mask of moved links.
+  """
+  delta = targets - positions
+  distances = np.sqrt(delta[:, 0]*delta[:, 0] + delta[:, 1]*delta[:, 1])
+  min_distances = distance * 2 + target_sizes + sizes
+  moving = distances > min_distances
+  if active is not None: moving &= active
+
+  if moving.any():
+    # Same operation order as Vector2, which divides by multiplying with the inverse
+    distances = distances[moving]
+    positions[moving] += delta[moving] * (1 / distances)[:, None] * (distances - min_distances[moving])[:, None]
+  return moving
 
 
 class JointFollowElement:
@@ -9,20 +32,35 @@ class JointFollowElement:
 
 
 class JointFollow:
-  def __init__(self, distance: float, leader: JointFollowElement):
+  def __init__(self, distance: float, leader: JointFollowElement, relaxed=False, iterations: int=8, tolerance: float=0.1):
     """
     :param distance: distance between each followers (must never be less than 0)
     :param leader: the leader
+    :param relaxed: when True, the whole chain is solved at once with Jacobi relaxation sweeps,
+    instead of one pass from the leader to the tail. The cost of an update is bounded by 'iterations',
+    but a long chain can take several updates to settle.
+    :param iterations: max number of sweeps per update, in relaxed mode
+    :param tolerance: sweeps stop when no follower moved more than this distance, in relaxed mode
     """
     self.leader = leader
     self.followers: list[JointFollowElement] = []
     self.distance = distance
+    self.iterations = iterations
+    self.tolerance = tolerance
+    self.__last_distance = self.distance
+    self.__awake_until = 0
+
+    if relaxed:
+      self.update_pos = self.update_pos_relaxed
 
   def update_pos(self, new_pos: Vector2):
     """Update the position of the leader"""
     self.leader.pos = new_pos
     # Security
     if self.distance < 0: self.distance = 0
+    if self.distance != self.__last_distance:
+      self.__last_distance = self.distance
+      self.wake()
 
     for i, f in enumerate(self.followers):
       target = self.leader if i == 0 else self.followers[i - 1]
@@ -31,14 +69,208 @@ class JointFollow:
 
       if distance > min_distance:
         f.pos += (target.pos - f.pos) / distance * (distance - min_distance)
+      elif i + 1 >= self.__awake_until:
+        # This follower didn't move and the next ones are at rest, so nothing will move anymore
+        break
+
+    self.__awake_until = 0
+
+  def update_pos_relaxed(self, new_pos: Vector2):
+    self.leader.pos = new_pos
+    # Security
+    if self.distance < 0: self.distance = 0
+    if not self.followers: return
+
+    count = len(self.followers) + 1
+    elements = [self.leader] + self.followers
+    positions = np.fromiter(chain.from_iterable(map(attrgetter("pos"), elements)), float, 2*count).reshape(count, 2)
+    sizes = np.fromiter(map(attrgetter("size"), elements), float, count)
+    initial = positions.copy()
+
+    for _ in range(self.iterations):
+      previous = positions[1:].copy()
+      # Targets are read before any write, so every link is pulled towards the previous sweep
+      pull_links(positions[1:], positions[:-1], sizes[1:], sizes[:-1], self.distance)
+      if np.abs(positions[1:] - previous).max() <= self.tolerance: break
+
+    # Only write back followers that moved
+    for i in np.flatnonzero((positions[1:] != initial[1:]).any(axis=1)).tolist():
+      self.followers[i].pos.update(positions[i+1, 0], positions[i+1, 1])
+
+  def wake(self, index: int=None):
+    """
+    Force the next update to check the follower at 'index' (and the next one, which targets it),
+    or every followers if 'index' is None. \n
+    Must be called after changing the size or the position of a follower.
+    """
+    if index is None: self.__awake_until = len(self.followers)
+    else: self.__awake_until = max(self.__awake_until, index + 2)
 
   def add_follower(self, follower: JointFollowElement):
     """Add a new follower in the trail"""
     self.followers.append(follower)
+    self.wake(len(self.followers) - 1)
 
   def pop_follower(self, index: int=-1):
     self.followers.pop(index)
+    # The next follower now targets another one
+    self.wake(index % (len(self.followers) + 1))
 
   def remove_follower(self, follower: JointFollowElement):
     """Remove a follower of the trail"""
     self.pop_follower(self.followers.index(follower))
+
+
+class JointFollowBatch:
+  def __init__(self, distance: float):
+    """
+    Many JointFollow chains stored in contiguous arrays, so link k of every chain is moved at once.
+    Followers at rest are not skipped, so they can still move by rounding errors that JointFollow ignores.
+
+    :param distance: distance between each followers (must never be less than 0)
+    """
+    self.distance = distance
+    self.leaders = np.zeros((0, 2))
+    self.leader_sizes = np.zeros(0)
+    self.positions = np.zeros((0, 0, 2)) # chains × links × 2
+    self.sizes = np.zeros((0, 0))
+    self.lengths = np.zeros(0, dtype=int) # followers count of each chain
+
+  def update_pos(self, new_pos: np.ndarray):
+    """Update the position of every leader, 'new_pos' is an array of shape (chains, 2)"""
+    self.leaders[:] = new_pos
+    # Security
+    if self.distance < 0: self.distance = 0
+
+    targets, target_sizes = self.leaders, self.leader_sizes
+    for k in range(self.positions.shape[1]):
+      pull_links(self.positions[:, k], targets, self.sizes[:, k], target_sizes, self.distance, self.lengths > k)
+      targets, target_sizes = self.positions[:, k], self.sizes[:, k]
+
+  def add_chain(self, leader: JointFollowElement, followers: list[JointFollowElement]=[]) -> int:
+    """
+    Add a new chain and return its index. Elements are copied, so they will not be updated. \n
+    The arrays are copied, use :py:meth:`add_chains` to add many chains.
+    """
+    return self.add_chains([leader], [followers])[0]
+
+  def add_chains(self, leaders: list[JointFollowElement], followers: list[list[JointFollowElement]]) -> range:
+    """Add a chain for each leader (with the followers at the same index), and return their indices"""
+    count = len(leaders)
+    lengths = np.fromiter(map(len, followers), int, count)
+    links = max(self.positions.shape[1], lengths.max(initial=0))
+    self.reserve_links(links)
+
+    positions = np.zeros((count, links, 2))
+    sizes = np.zeros((count, links))
+    for c, chain_followers in enumerate(followers):
+      for i, f in enumerate(chain_followers):
+        positions[c, i] = f.pos
+        sizes[c, i] = f.size
+
+    first = len(self.lengths)
+    leader_positions = np.fromiter(chain.from_iterable(map(attrgetter("pos"), leaders)), float, 2*count).reshape(count, 2)
+    self.leaders = np.concatenate((self.leaders, leader_positions))
+    self.leader_sizes = np.append(self.leader_sizes, np.fromiter(map(attrgetter("size"), leaders), float, count))
+    self.positions = np.concatenate((self.positions, positions))
+    self.sizes = np.concatenate((self.sizes, sizes))
+    self.lengths = np.append(self.lengths, lengths)
+    return range(first, first + count)
+
+  def pop_chain(self, index: int=-1):
+    index %= len(self.lengths)
+    self.leaders = np.delete(self.leaders, index, 0)
+    self.leader_sizes = np.delete(self.leader_sizes, index)
+    self.positions = np.delete(self.positions, index, 0)
+    self.sizes = np.delete(self.sizes, index, 0)
+    self.lengths = np.delete(self.lengths, index)
+
+  def reserve_links(self, links: int):
+    """Make room for at least 'links' followers in each chain"""
+    missing = links - self.positions.shape[1]
+    if missing > 0:
+      self.positions = np.pad(self.positions, ((0, 0), (0, missing), (0, 0)))
+      self.sizes = np.pad(self.sizes, ((0, 0), (0, missing)))
+
+  def get_chain(self, index: int) -> np.ndarray:
+    """Get the follower positions of a chain (as a view)"""
+    return self.positions[index, :self.lengths[index]]
+
+
+class JointTree:
+  def __init__(self, distance: float, leader: JointFollowElement):
+    """
+    Followers organized as a tree, each node follows its parent (or the leader).
+    Nodes are stored in arrays and moved level by level, so all nodes at the same depth move at once.
+
+    :param distance: distance between each nodes (must never be less than 0)
+    :param leader: the leader
+    """
+    self.leader = leader
+    self.distance = distance
+    self.positions = np.zeros((0, 2))
+    self.sizes = np.zeros(0)
+    self.parents = np.zeros(0, dtype=int) # -1 is the leader
+    self.__levels: list[tuple[np.ndarray, np.ndarray]]|None = []
+
+  def update_pos(self, new_pos: Vector2):
+    """Update the position of the leader"""
+    self.leader.pos = new_pos
+    # Security
+    if self.distance < 0: self.distance = 0
+
+    for depth, (nodes, parents) in enumerate(self.get_levels()):
+      if depth:
+        targets, target_sizes = self.positions[parents], self.sizes[parents]
+      else:
+        targets, target_sizes = np.broadcast_to(self.leader.pos, (len(nodes), 2)), self.leader.size
+
+      positions = self.positions[nodes]
+      pull_links(positions, targets, self.sizes[nodes], target_sizes, self.distance)
+      self.positions[nodes] = positions
+
+  def get_levels(self) -> list[tuple[np.ndarray, np.ndarray]]:
+    """Get node and parent indices of each depth, in topological order"""
+    if self.__levels is None:
+      # A parent is always before its children, so depths can be computed in one pass
+      depths = [0] * len(self.parents)
+      for i, parent in enumerate(self.parents.tolist()):
+        if parent >= 0: depths[i] = depths[parent] + 1
+
+      depths = np.array(depths, dtype=int)
+      order = np.argsort(depths, kind="stable")
+      bounds = np.cumsum(np.bincount(depths))[:-1] if len(depths) else []
+      self.__levels = [(nodes, self.parents[nodes]) for nodes in np.split(order, bounds)]
+    return self.__levels
+
+  def add_node(self, pos: Vector2, size: float, parent: int=-1) -> int:
+    """Add a new node following 'parent' (the leader if -1) and return its index"""
+    return self.add_nodes([pos], [size], [parent])[0]
+
+  def add_nodes(self, positions: np.ndarray, sizes: np.ndarray, parents: np.ndarray) -> np.ndarray:
+    """Add many nodes at once and return their indices. A parent must be added before its children."""
+    start = len(self.parents)
+    parents = np.asarray(parents, dtype=int)
+    if np.any(parents >= start + np.arange(len(parents))):
+      raise ValueError("a parent must be added before its children")
+
+    self.positions = np.concatenate((self.positions, np.asarray(positions, dtype=float).reshape(-1, 2)))
+    self.sizes = np.concatenate((self.sizes, np.asarray(sizes, dtype=float)))
+    self.parents = np.concatenate((self.parents, parents))
+    self.__levels = None
+    return np.arange(start, len(self.parents))
+
+  def pop_node(self, index: int=-1):
+    """Remove a node, its children will follow its parent"""
+    index %= len(self.parents)
+    parents = self.parents
+    parents[parents == index] = parents[index]
+    parents[parents > index] -= 1
+
+    self.positions = np.delete(self.positions, index, 0)
+    self.sizes = np.delete(self.sizes, index)
+    self.parents = np.delete(parents, index)
+    self.__levels = None
+
+  def get_children(self, index: int) -> np.ndarray:
+    return np.flatnonzero(self.parents == index)
@@ -11,7 +11,8 @@ class OrbitFollowExample(OrbitFollow):
   adapter_names = {
     OrbitFollow.adapt_compact_approx: "Compact Approx",
     OrbitFollow.adapt_compact: "Compact",
-    OrbitFollow.adapt_fast: "Fast"
+    OrbitFollow.adapt_fast: "Fast",
+    OrbitFollow.adapt_auto: "Auto"
   }
   adpaters = list(adapter_names.keys())
 
@@ -1,9 +1,20 @@
 # You can use any other library that includes standard Vector things
 from pygame import Vector2
+from bisect import bisect_right
+from functools import reduce
+from inspect import signature
+from itertools import repeat
+from operator import add, attrgetter, mul, truediv
+from time import perf_counter
 import math
+import numpy as np
 
 
 SPEED_SCALE = 1 / 8
+# Adapters from the best layout to the fastest, for OrbitFollow.adapt_auto
+AUTO_ADAPTERS = ("adapt_compact", "adapt_compact_approx", "adapt_fast")
+# Relayouts of less followers are not measured, the overhead would hide the cost per follower
+AUTO_MIN_MEASURED = 64
 
 
 def advance_on_circle(radius: float, chord: float, fallback: float=math.tau) -> float:
@@ -11,6 +22,13 @@ def advance_on_circle(radius: float, chord: float, fallback: float=math.tau) ->
   if not -1 <= alpha <=1: return fallback
   return 2 * math.asin(alpha)
 
+def advance_on_circle_sum(radius: float, chords: list[float]) -> float:
+  """Same as adding :py:func:`advance_on_circle` for every chord one by one (same rounding), but looping in C"""
+  alphas = list(map(truediv, chords, repeat(2*radius)))
+  if alphas and max(map(abs, alphas)) > 1:
+    return reduce(add, (advance_on_circle(radius, chord) for chord in chords), 0)
+  return reduce(add, map(mul, repeat(2), map(math.asin, alphas)), 0)
+
 def regular_polygon_radius(sides: int, side: float) -> float:
   return side / (2 * math.sin(math.pi/sides))
 
@@ -18,8 +36,39 @@ def regular_polygon_radius(sides: int, side: float) -> float:
 class OrbitFollowRing:
   def __init__(self):
     self.angle = 0
-    self.radius = 1
-    self.angles: list[float] = []
+    self.__radius = 1
+    self.__angles: list[float] = []
+    # Checkpoint to resume the layout from this ring
+    self.start = 0 # Index of the first follower
+    self.total_radius = 0 # Radius inside the ring
+    # Caches
+    self.__offsets: np.ndarray|None = None
+
+  @property
+  def radius(self) -> float:
+    return self.__radius
+
+  @radius.setter
+  def radius(self, value: float):
+    self.__radius = value
+    self.__offsets = None
+
+  @property
+  def angles(self) -> list[float]:
+    """Angles of the followers in the ring. Assign a new list to change them, it's not watched in place"""
+    return self.__angles
+
+  @angles.setter
+  def angles(self, value: list[float]):
+    self.__angles = value
+    self.__offsets = None
+
+  @property
+  def offsets(self) -> np.ndarray:
+    """Read-only: Offsets of the followers from the leader (as complex numbers), before the rotation of the ring"""
+    if self.__offsets is None:
+      self.__offsets = self.__radius * np.exp(1j * np.array(self.__angles, float))
+    return self.__offsets
 
   def add_angle(self, degree: int):
     self.angle += math.radians(degree)
@@ -33,13 +82,16 @@ class OrbitFollowElement:
 
 
 class OrbitFollow:
-  def __init__(self, spacing: float, gap: float, speed: float, leader: OrbitFollowElement, adapter: 'function'=None):
+  def __init__(self, spacing: float, gap: float, speed: float, leader: OrbitFollowElement, adapter: 'function'=None,
+               relayout_budget: float=0.004):
     """
     :param spacing: distance between followers
     :param gap: minimum distance between rings
     :param speed: angle (in deg) to add each updates
     :param leader: the leader
-    :param adapter: Set to :py:meth:`adapt_rings_even_spacing`, :py:meth:`adapt_rings_even_placement` or :py:meth:`adapt_rings_even_spacing_no_retrocorrection`.
+    :param adapter: Set to :py:meth:`adapt_compact`, :py:meth:`adapt_compact_approx`, :py:meth:`adapt_fast` or :py:meth:`adapt_auto`.
+    A custom adapter can take the index of the first changed follower ('start'), otherwise everything is adapted again.
+    :param relayout_budget: time (in seconds) a relayout should take, used by :py:meth:`adapt_auto`
     """
     self.leader = leader
     self.followers: list[OrbitFollowElement] = []
@@ -51,6 +103,15 @@ class OrbitFollow:
     self.__last_spacing = self.spacing
     self.__last_speed = self.speed
     self.__total_size = 0
+    self.ticks = 0 # Number of updates
+    self.relayout_budget = relayout_budget
+    self.auto_adapter = AUTO_ADAPTERS[0] # Last adapter used by adapt_auto
+    # Measured seconds per follower of each adapter, starting from rough estimates
+    self.__adapter_costs = dict(zip(AUTO_ADAPTERS, (2e-6, 1.5e-6, 1e-6)))
+    # Caches
+    self.__ring_offsets: list[np.ndarray] = []
+    self.__offsets = np.empty(0, complex)
+    self.__counts = np.empty(0, int)
 
     if adapter: self.adapt_rings = adapter
     
@@ -58,6 +119,7 @@ class OrbitFollow:
     """Update the position of the leader"""
     self.check_rings()
     self.leader.pos = new_pos
+    self.ticks += 1
     
     # No rings so stop here
     if not self.rings: return
@@ -67,71 +129,129 @@ class OrbitFollow:
       self.rings[i].add_angle((self.speed if i % 2 else -self.speed) * SPEED_SCALE)
     
     # Update followers
-    i = 0
-    for ring in self.rings:
-      for angle in ring.angles:
-        shift = ring.angle + angle
-        self.followers[i].pos = self.leader.pos + Vector2(math.cos(shift), math.sin(shift)) * ring.radius
-        i += 1
+    self.place_followers(self.get_positions(self.get_angles()))
+
+  def fast_forward(self, ticks: int):
+    """Rotate the rings as if :py:meth:`update_pos` was called 'ticks' times without moving the leader, in one step"""
+    self.check_rings()
+    angles = self.get_angles(self.ticks + ticks)
+    self.ticks += ticks
+    for ring, angle in zip(self.rings, angles.tolist()):
+      ring.angle = angle
+    self.place_followers(self.get_positions(angles))
+
+  def positions_at(self, t: float) -> np.ndarray:
+    """
+    Positions (an array of shape (n, 2)) of the followers at tick 't', in the past or in the future,
+    if the leader stays in place and the rings don't change. Nothing is moved.
+    """
+    self.check_rings()
+    positions = self.get_positions(self.get_angles(t))
+    return np.stack((positions.real, positions.imag), 1)
+
+  def get_angles(self, t: float=None) -> np.ndarray:
+    """
+    Angles of the rings at tick 't' (default: now), evaluated from the current ones.
+    Odd rings turn with 'speed', even rings against it.
+    """
+    count = len(self.rings)
+    angles = np.fromiter(map(attrgetter("angle"), self.rings), float, count)
+    if t is None or t == self.ticks: return angles
+    step = math.radians(self.speed * SPEED_SCALE) * (t - self.ticks)
+    return (angles + np.where(np.arange(count) % 2, step, -step)) % math.tau
+
+  def get_positions(self, angles: np.ndarray) -> np.ndarray:
+    """Positions of the followers (as complex numbers) with rings at 'angles', with one rotation per ring"""
+    rotations = np.exp(1j * angles)
+    return self.get_offsets() * np.repeat(rotations, self.__counts) + complex(*self.leader.pos)
+
+  def place_followers(self, positions: np.ndarray):
+    for follower, x, y in zip(self.followers, positions.real.tolist(), positions.imag.tolist()):
+      follower.pos = Vector2(x, y)
+
+  def get_offsets(self) -> np.ndarray:
+    """Offsets of every follower (as complex numbers) before ring rotations, gathered again only when a ring changed"""
+    ring_offsets = [ring.offsets for ring in self.rings]
+    if len(ring_offsets) != len(self.__ring_offsets) or any(map(
+      lambda new, old: new is not old, ring_offsets, self.__ring_offsets
+    )):
+      self.__ring_offsets = ring_offsets
+      self.__offsets = np.concatenate(ring_offsets) if ring_offsets else np.empty(0, complex)
+      self.__counts = np.fromiter(map(len, ring_offsets), int, len(ring_offsets))
+    return self.__offsets
   
-  def adapt_compact_approx(self):
+  def adapt_compact_approx(self, start: int=0):
     """
     Place followers with even spacing between them.
     This mode is faster than :py:meth:`adapt_compact`. \n
     WARNING: this method can create overlapping followers.
+
+    :param start: index of the first changed follower, rings before it are kept
     """
-    in_ring = ring = angle = 0
-    biggest = self.leader.size
-    total_radius = self.gap + biggest
-    max_i = len(self.followers) - 1    
+    ring, first, total_radius = self.get_checkpoint(start)
+    followers = self.followers[first:]
+    in_ring = angle = 0
+    exact = True # When False, 'angle' was summed with smaller radii, so it's only an upper bound
+    biggest = self.leader.size if ring == 0 else 0
+    max_i = len(followers) - 1    
     # Cache
-    chords = [self.followers[i].size + self.spacing + self.followers[i+1].size 
+    chords = [followers[i].size + self.spacing + followers[i+1].size 
               for i in range(max_i)] 
 
-    for i, f in enumerate(self.followers):
+    for i, f in enumerate(followers):
       in_ring += 1
       radius = total_radius + biggest
       
       if f.size > biggest:
         biggest = f.size
         radius = total_radius + biggest
-        # Recalculate previous angles
-        angle = 0
-        for ii in range(i-in_ring+1, i-1):
-          angle += advance_on_circle(radius, chords[ii])
+        # Previous angles shrink, they are recalculated only if the ring may be full
+        exact = in_ring == 1
 
       if in_ring >= 2: angle += advance_on_circle(radius, chords[i-1])
       
-      total_angle = angle + advance_on_circle(radius, f.size + self.spacing + self.followers[i-in_ring+1].size)
+      total_angle = angle + advance_on_circle(radius, f.size + self.spacing + followers[i-in_ring+1].size)
+      if not exact and ((in_ring > 2 and total_angle > math.tau) or i >= max_i):
+        # Recalculate previous angles
+        angle = advance_on_circle_sum(radius, chords[i-in_ring+1:i])
+        total_angle = angle + advance_on_circle(radius, f.size + self.spacing + followers[i-in_ring+1].size)
+        exact = True
       if (in_ring > 2 and total_angle > math.tau) or i >= max_i:
         angle = total_angle
         
         r = self.get_ring(ring)
         r.radius = radius
+        r.start = first + i - in_ring + 1
+        r.total_radius = total_radius
         extra = (math.tau - angle) / in_ring
-        r.angles = [0]
+        angles = [0]
         for ii in range(i-in_ring+1, i):
-          r.angles.append(r.angles[-1] + extra + advance_on_circle(r.radius, chords[ii]))
+          angles.append(angles[-1] + extra + advance_on_circle(r.radius, chords[ii]))
+        r.angles = angles
         
         total_radius += self.gap + 2*biggest
         ring += 1
         in_ring = angle = biggest = 0
+        exact = True
         
     # Remove empty rings
     self.rings = self.rings[:ring]
   
-  def adapt_compact(self):
+  def adapt_compact(self, start: int=0):
     """
     Place followers with even spacing between them.
     This mode is slower than :py:meth:`adapt_compact_approx`.
+
+    :param start: index of the first changed follower, rings before it are kept
     """
+    ring_i, first, total_radius = self.get_checkpoint(start)
     # Caches
-    to_add = [f.size for f in self.followers]
+    to_add = [f.size for f in self.followers[first:]]
     chords = [to_add[i] + self.spacing + to_add[i+1] for i in range(len(to_add)-1)] # at i is stored chord between follower i and i+1.
 
-    ring_i = start_i = angle = biggest = last_biggest = 0
+    start_i = angle = biggest = last_biggest = 0
     end_i = -1
-    total_radius = self.gap + self.leader.size
+    exact = True # When False, 'angle' was summed with smaller radii, so it's only an upper bound
     
     while end_i < len(to_add) - 1:
       end_i += 1
@@ -142,11 +262,8 @@ class OrbitFollow:
         last_biggest = biggest
         biggest = size
         radius = total_radius + biggest
-        
-        # Recalculate previous angles
-        angle = 0
-        for i in range(start_i, end_i - 1):
-          angle += advance_on_circle(radius, chords[i])
+        # Previous angles shrink, they are recalculated only if the ring may be full
+        exact = end_i == start_i
       
       if end_i - start_i >= 1:
         angle += advance_on_circle(radius, chords[end_i-1])
@@ -156,6 +273,15 @@ class OrbitFollow:
         and angle + advance_on_circle(radius, size + self.spacing + to_add[start_i]) > math.tau
       )
       
+      if not exact and (overfits or end_i >= len(to_add) - 1):
+        # Recalculate previous angles
+        angle = advance_on_circle_sum(radius, chords[start_i:end_i])
+        exact = True
+        overfits = (
+          end_i - start_i > 1
+          and angle + advance_on_circle(radius, size + self.spacing + to_add[start_i]) > math.tau
+        )
+      
       if overfits or end_i >= len(to_add) - 1:
         if overfits:
           # Remove the follower who is overflowing
@@ -164,9 +290,7 @@ class OrbitFollow:
           if to_add[end_i+1] > size: # Don't use min() it won't work in every case
             biggest = last_biggest
             radius = total_radius + biggest
-            angle = 0
-            for i in range(start_i, end_i - 1):
-              angle += advance_on_circle(radius, chords[i])
+            angle = advance_on_circle_sum(radius, chords[start_i:end_i-1])
           elif end_i - start_i >= 0:
             angle -= advance_on_circle(radius, chords[end_i])
         
@@ -175,6 +299,8 @@ class OrbitFollow:
         # Create the new ring with every selected followers
         ring = self.get_ring(ring_i)
         ring.radius = radius
+        ring.start = first + start_i
+        ring.total_radius = total_radius
         extra = (math.tau - angle) / (end_i - start_i + 1)
         angles = [0]
         for i in range(start_i, end_i):
@@ -187,19 +313,22 @@ class OrbitFollow:
         
         # Clean up variables
         angle = biggest = last_biggest = 0
+        exact = True
         start_i = end_i + 1
     
     # Remove empty rings
     self.rings = self.rings[:ring_i]
   
-  def adapt_fast(self):
+  def adapt_fast(self, start: int=0):
     """
     Place followers with even spacing between their centers.
     This mode is the faster.
+
+    :param start: index of the first changed follower, rings before it are kept
     """
-    ring_i = longest_side = biggest = last_biggest = 0
-    total_radius = self.gap + self.leader.size
-    to_add = [f.size for f in self.followers[::-1]]
+    ring_i, first, total_radius = self.get_checkpoint(start)
+    longest_side = biggest = last_biggest = 0
+    to_add = [f.size for f in self.followers[first:][::-1]]
     in_ring = []
   
     while to_add:
@@ -230,6 +359,9 @@ class OrbitFollow:
         # Create the new ring with every selected followers
         ring = self.get_ring(ring_i)
         ring.radius = total_radius + biggest
+        ring.start = first
+        ring.total_radius = total_radius
+        first += len(in_ring)
         step = math.tau / len(in_ring)
         ring.angles = [step * i for i in range(len(in_ring))]
         
@@ -244,8 +376,38 @@ class OrbitFollow:
     # Remove empty rings
     self.rings = self.rings[:ring_i]
 
+  def adapt_auto(self, start: int=0):
+    """
+    Use the best adapter expected to fit in .relayout_budget, from the time per follower measured for each adapter.
+    So small formations are compact, and big ones are fast.
+
+    :param start: index of the first changed follower, rings before it are kept
+    """
+    count = len(self.followers) - self.get_checkpoint(start)[1]
+    costs = self.__adapter_costs
+    self.auto_adapter = next(
+      (name for name in AUTO_ADAPTERS if costs[name] * count <= self.relayout_budget),
+      AUTO_ADAPTERS[-1]
+    )
+
+    started = perf_counter()
+    getattr(self, self.auto_adapter)(start)
+    if count >= AUTO_MIN_MEASURED:
+      # Smooth the measures
+      costs[self.auto_adapter] += ((perf_counter() - started) / count - costs[self.auto_adapter]) * 0.25
+
   adapt_rings = adapt_compact
 
+  def get_checkpoint(self, index: int) -> tuple[int, int, float]:
+    """
+    Ring to resume the layout from, when followers changed from 'index'. Return its index, first follower and inner radius.
+    A ring also depends on the follower after it (which didn't fit), so the ring of the follower before 'index' is used.
+    """
+    ring_i = bisect_right(self.rings, index - 1, key=attrgetter("start")) - 1
+    if ring_i <= 0: return 0, 0, self.gap + self.leader.size
+    ring = self.rings[ring_i]
+    return ring_i, ring.start, ring.total_radius
+
   def check_rings(self):
     """Recalculate the rings if .gap, .spacing or a follower size has been changed"""
     total = sum(f.size for f in self.followers)
@@ -269,14 +431,23 @@ class OrbitFollow:
     """Add a new follower in the rings"""
     self.followers.append(follower)
     
-    # Adapt rings
+    # Adapt rings, only the last one can change
     self.__total_size += follower.size
-    self.adapt_rings()
+    self.__adapt_from(len(self.followers) - 1)
 
   def pop_follower(self, index: int=-1):
     removed = self.followers.pop(index)
     self.__total_size -= removed.size
-    self.adapt_rings()
+    self.__adapt_from(index % (len(self.followers) + 1))
+
+  def __adapt_from(self, start: int):
+    """Adapt the rings from the follower at 'start', or all of them if .adapt_rings doesn't take it"""
+    try:
+      signature(self.adapt_rings).bind(start)
+    except TypeError:
+      self.adapt_rings()
+    else:
+      self.adapt_rings(start)
 
   def remove_follower(self, follower: OrbitFollowElement):
     """Remove a follower of the rings"""
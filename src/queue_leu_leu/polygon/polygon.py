@@ -1,9 +1,13 @@
 # You can use any other library that includes standard Vector things
 from types import UnionType
 from pygame import Vector2
-from math import pi, cos, sin, asin, radians, sqrt, isclose
+from math import pi, cos, sin, asin, radians, sqrt, isclose, floor
 from typing import Generator, Self, Callable, Sequence
 from enum import IntEnum, auto
+from heapq import heappush, heappop
+from bisect import bisect_left
+from itertools import accumulate, count
+from collections import OrderedDict
 
 
 type HashedVector2 = tuple[float, float]
@@ -83,6 +87,68 @@ def intersect_segments(p1: Vector2, p2: Vector2, d1: Vector2, d2: Vector2) -> Ve
   return intersection
 
 
+def reach_segment(points: Sequence[Vector2], segments: Sequence[Vector2], last_pos: Vector2, segment: Vector2, distance: float, first_i: int) -> tuple[int, Vector2, float]|None:
+  """
+  Find the first segment, from 'first_i', having a point at 'distance' from 'last_pos' (which is on 'segment').
+  Return the segment index, the point and its progress (length) on the segment, or None.
+  """
+  for new_segment_i in range(first_i, len(segments)):
+    angle_to_next: float = radians(segments[new_segment_i].angle_to(segment))
+    if abs(angle_to_next%pi) <= 1e-6:
+      extend_from = (last_pos - points[new_segment_i]).project(segments[new_segment_i]) + points[new_segment_i]
+      extend_by = distance * cos(asin((extend_from - last_pos).length()/distance))
+      displacement = scale_to_length(segment, extend_by)
+      attempts: list[tuple[Vector2, float]] = list(map(
+        lambda attempt: (attempt, get_segment_progress(attempt, points[new_segment_i], segments[new_segment_i])),
+        [
+          extend_from + displacement,
+          extend_from - displacement
+        ]
+      ))
+      attempts.sort(key=lambda attempt: attempt[1])
+      for attempt in attempts:
+        if 0 <= attempt[1] <= 1:
+          return new_segment_i, attempt[0], (attempt[0] - points[new_segment_i]).length()
+    else:
+      to_start: Vector2 = points[new_segment_i] - last_pos
+      angle_last_start_new: float = abs(pi - radians(abs(to_start.angle_to(segments[new_segment_i]))))
+      distance_last_start = to_start.length()
+      sin_next: float = distance_last_start * sin(angle_last_start_new) / distance
+      angle_deviation: float = angle_last_start_new + asin(sin_next)
+      new_progress: float = distance_last_start * sin(angle_deviation) / sin_next
+      attempt: Vector2 = points[new_segment_i] + scale_to_length(segments[new_segment_i], new_progress)
+      if 0 <= get_segment_progress(attempt, points[new_segment_i], segments[new_segment_i]) <= 1:
+        return new_segment_i, attempt, new_progress
+  
+  return None
+
+
+class SpatialHash:
+  """
+  Indices of positions, sorted in square cells.
+  Positions closer than the cell size are always in neighbour cells.
+  """
+  
+  def __init__(self, cell_size: float, positions: Sequence[Vector2] = ()) -> None:
+    self.cell_size: float = cell_size or 1
+    self.cells: dict[tuple[int, int], list[int]] = {}
+    for i, position in enumerate(positions):
+      self.add(i, position)
+  
+  def get_cell(self, position: Vector2) -> tuple[int, int]:
+    return floor(position.x / self.cell_size), floor(position.y / self.cell_size)
+  
+  def add(self, i: int, position: Vector2) -> None:
+    self.cells.setdefault(self.get_cell(position), []).append(i)
+  
+  def get_near(self, position: Vector2) -> Generator[int, None, None]:
+    """Indices in the cell of 'position' and its neighbours"""
+    x, y = self.get_cell(position)
+    for cell_x in (x-1, x, x+1):
+      for cell_y in (y-1, y, y+1):
+        yield from self.cells.get((cell_x, cell_y), ())
+
+
 class GrowthMode(IntEnum):
   EXPAND_AND_MERGE = 0
   EXPAND = auto()
@@ -96,13 +162,20 @@ class Polygon:
   Warning: Consecutive points can't be at the same position (zero-lenght sides are forbidden)
   """
   
+  _versions = count()
+  
   def __init__(self, points: list[Vector2] = []) -> None:
     self.points: list[Vector2] = points
     
     self._segments: list[Vector2] = []
+    self._lengths: list[float] = []
+    self._reversed_points: list[Vector2] = []
+    self._reversed_segments: list[Vector2] = []
+    self._reversed_cumulative_lengths: list[float] = []
     self._growth_vectors: list[Vector2] = []
     self._incircle_radius: float = 1
     self._checksum: int = 0
+    self._version: int = 0
     
     self.bake()
   
@@ -121,11 +194,14 @@ class Polygon:
       self.points = [point for point, next_ in zip(self.points, self.points[1:] + [self.points[0]]) if point != next_]
       
     self._bake_segments()
+    self._bake_lengths()
     self._bake_growth_vectors()
     self._bake_incircle()
     
     # Used for fast approximative change detection
     self._checksum = sum(p.x + p.y for p in self.points)
+    # Unique for each bake, used for exact change detection
+    self._version = next(Polygon._versions)
   
   def _bake_incircle(self):
     self._incircle_radius = sqrt(min(map(lambda v: v.length_squared(), self.project_all_clamped(Vector2())))) if self._segments else 1
@@ -136,6 +212,13 @@ class Polygon:
     else:
       self._segments = []
   
+  def _bake_lengths(self) -> None:
+    """Lengths of segments, and the polygon walked backward from the first point (for :py:meth:`walk_back`)"""
+    self._lengths = [segment.length() for segment in self._segments]
+    self._reversed_points = [self.points[0]] + self.points[:0:-1] if self._segments else []
+    self._reversed_segments = [-segment for segment in reversed(self._segments)]
+    self._reversed_cumulative_lengths = list(accumulate(reversed(self._lengths)))
+  
   def _bake_growth_vectors(self) -> None:
     if len(self.points) < 3:
       self._growth_vectors = []
@@ -204,45 +287,85 @@ class Polygon:
     relative_to_start: Vector2 = point - self.points[segment_i]
     return relative_to_start.x / self._segments[segment_i].x if self._segments[segment_i].x else relative_to_start.y / self._segments[segment_i].y
   
-  def merge_self_contained(self) -> Self:
+  def find_self_intersections(self) -> list[list[Intersection]]:
+    """
+    Intersections of each segment with the non adjacent ones, sorted by progress along the segment.
+    Segments are swept from left to right, so only segments overlapping on the x axis are tested:
+    O(n log n + tested pairs) instead of testing every pair.
+    """
     cached_len: int = len(self.points)
+    ends: list[Vector2] = self.points[1:] + self.points[:1]
     intersections: list[list[Intersection]] = [[] for _ in range(cached_len)]
+    bounds: list[tuple[float, float, float, float]] = [
+      (min(start.x, end.x), max(start.x, end.x), min(start.y, end.y), max(start.y, end.y))
+      for start, end in zip(self.points, ends)
+    ]
+    # Computed intersections can be slightly outside segments
+    margin: float = 1e-9 * (1 + max((abs(c) for point in self.points for c in point), default=0))
     
-    for i, point in enumerate(self.points):
-      for other_i in range(i+2, cached_len) if i else range(i+2, cached_len-1):
-        intersection: Vector2|None = intersect_segments(point, self.points[(i+1)%cached_len], self.points[other_i], self.points[(other_i+1)%cached_len])
+    active: list[tuple[float, int]] = [] # Heap of segments (by right end) that can still be crossed
+    for i in sorted(range(cached_len), key=lambda i: bounds[i][0]):
+      x_min, x_max, y_min, y_max = bounds[i]
+      while active and active[0][0] < x_min - margin:
+        heappop(active)
+      
+      for _, other_i in active:
+        other_bounds = bounds[other_i]
+        if abs(i - other_i) in (1, cached_len - 1) or y_min > other_bounds[3] + margin or other_bounds[2] > y_max + margin:
+          continue # Adjacent or not overlapping
+        
+        first_i, second_i = min(i, other_i), max(i, other_i)
+        intersection: Vector2|None = intersect_segments(self.points[first_i], ends[first_i], self.points[second_i], ends[second_i])
         if intersection is not None:
-          intersections[i].append((other_i, intersection, self.get_segment_progress(intersection, i)))
-          intersections[other_i].append((i, intersection, self.get_segment_progress(intersection, other_i)))
+          intersections[first_i].append((second_i, intersection, self.get_segment_progress(intersection, first_i)))
+          intersections[second_i].append((first_i, intersection, self.get_segment_progress(intersection, second_i)))
+      
+      heappush(active, (x_max, i))
+    
+    for l in intersections:
+      # Same order as testing pairs by index
+      l.sort(key=lambda intersection: (intersection[2], intersection[0]))
+    
+    return intersections
+  
+  def merge_self_contained(self) -> Self:
+    cached_len: int = len(self.points)
+    intersections: list[list[Intersection]] = self.find_self_intersections()
     
     for i, l in enumerate(intersections):
-      l.sort(key=lambda intersection: intersection[2])
       l.insert(0, ((i-1)%cached_len, self.points[i], -1))
       l.append(((i+1)%cached_len, self.points[(i+1)%cached_len], 2))
     
-    graph: dict[HashedVector2, list[HashedVector2]] = {(*intersection[1],): [] for segment in intersections for intersection in segment}
+    # Vertices are identified by index, same positions share the same vertex
+    vertex_ids: dict[HashedVector2, int] = {}
+    segments_ids: list[list[int]] = [
+      [vertex_ids.setdefault((*intersection[1],), len(vertex_ids)) for intersection in segment]
+      for segment in intersections
+    ]
+    vertices: list[HashedVector2] = list(vertex_ids)
+    graph: list[list[int]] = [[] for _ in vertices]
     
-    for segment in intersections:
-      for inter_i in range(1, len(segment)):
-        graph[(*segment[inter_i-1][1],)].append((*segment[inter_i][1],))
-        graph[(*segment[inter_i][1],)].append((*segment[inter_i-1][1],))
+    for segment_ids in segments_ids:
+      for previous, current in zip(segment_ids, segment_ids[1:]):
+        graph[previous].append(current)
+        graph[current].append(previous)
     
-    start_point: HashedVector2 = min(graph.keys(), key=lambda hash_: hash_[0])
-    new_points: list[HashedVector2] = [start_point]
-    current_point: HashedVector2 = min(
-      (point for point in graph[start_point]),
-      key=lambda point: get_absolute_angle_deg(Vector2(point)-start_point)
+    start_point: int = min(range(len(vertices)), key=lambda id_: vertices[id_][0])
+    new_points: list[int] = [start_point]
+    current_point: int = min(
+      graph[start_point],
+      key=lambda id_: get_absolute_angle_deg(Vector2(vertices[id_])-vertices[start_point])
     )
     
     while current_point != start_point:
       new_points.append(current_point)
-      reference: Vector2 = Vector2(current_point) - new_points[-2]
+      reference: Vector2 = Vector2(vertices[current_point]) - vertices[new_points[-2]]
       current_point = min(
-        (point for point in graph[current_point] if point != new_points[-2]),
-        key=lambda point: angle_to_deg_closest_to_0(reference, Vector2(point)-current_point)
+        (id_ for id_ in graph[current_point] if id_ != new_points[-2]),
+        key=lambda id_: angle_to_deg_closest_to_0(reference, Vector2(vertices[id_])-vertices[current_point])
       )
     
-    self.points = [*map(Vector2, new_points)]
+    self.points = [Vector2(vertices[id_]) for id_ in new_points]
     self.bake()
     return self
 
@@ -256,10 +379,9 @@ class Polygon:
     segment_i: int = 0
     segment: Vector2 = self._segments[segment_i]
     segment_progress: float = 0
-    segment_length: float = segment.length()
+    segment_length: float = self._lengths[segment_i]
     last_pos: Vector2 = self.points[0]
     wanted_progress, distance_to_end = yield last_pos
-    reversed_polygon: Polygon|None = None
     
     while True:
       if segment_progress + wanted_progress <= segment_length:
@@ -270,74 +392,48 @@ class Polygon:
               yield None
               return
             segment = self._segments[segment_i]
-            segment_length = segment.length()
+            segment_length = self._lengths[segment_i]
             segment_progress = 0
             last_pos = self.points[segment_i]
           else:
             last_pos = self.points[segment_i] + scale_to_length(segment, segment_progress)
       else:
-        new_segment_i: int = segment_i + 1
-        result: None|Vector2 = None
-        while new_segment_i < len(self._segments):
-          angle_to_next: float = radians(self._segments[new_segment_i].angle_to(segment))
-          if abs(angle_to_next%pi) <= 1e-6:
-            extend_from = self.project(last_pos, new_segment_i)
-            extend_by = wanted_progress * cos(asin((extend_from - last_pos).length()/wanted_progress))
-            displacement = scale_to_length(segment, extend_by)
-            attempts: list[tuple[Vector2, float]] = list(map(
-              lambda attempt: (attempt, self.get_segment_progress(attempt, new_segment_i)),
-              [
-                extend_from + displacement,
-                extend_from - displacement
-              ]
-            ))
-            attempts.sort(key=lambda attempt: attempt[1])
-            for attempt in attempts:
-              if 0 <= attempt[1] <= 1:
-                result = attempt[0]
-                segment_progress = (result - self.points[new_segment_i]).length()
-                break
-          else:
-            to_start: Vector2 = self.points[new_segment_i] - last_pos
-            angle_last_start_new: float = abs(pi - radians(abs(to_start.angle_to(self._segments[new_segment_i]))))
-            distance_last_start = to_start.length()
-            sin_next: float = distance_last_start * sin(angle_last_start_new) / wanted_progress
-            angle_deviation: float = angle_last_start_new + asin(sin_next)
-            new_progress: float = distance_last_start * sin(angle_deviation) / sin_next
-            attempt: Vector2 = self.points[new_segment_i] + scale_to_length(self._segments[new_segment_i], new_progress)
-            if 0 <= self.get_segment_progress(attempt, new_segment_i) <= 1:
-              result = attempt
-              segment_progress = new_progress
-          
-          if result is not None: # Warning: Do not check falsy as Vector can be (0, 0)
-            segment_i = new_segment_i
-            segment = self._segments[segment_i]
-            segment_length = segment.length()
-            last_pos = result
-            break
-          
-          new_segment_i += 1
-        else:
+        reached = reach_segment(self.points, self._segments, last_pos, segment, wanted_progress, segment_i + 1)
+        if reached is None:
           yield None
           return
+        segment_i, last_pos, segment_progress = reached
+        segment = self._segments[segment_i]
+        segment_length = self._lengths[segment_i]
       
       if distance_to_end > 0:
-        if reversed_polygon is None:
-          reversed_polygon = Polygon([self.points[0]] + self.points[:0:-1])
-        
-        reversed_walker = reversed_polygon.walk()
-        reversed_walker.send(None)
-        reversed_walker.send((distance_to_end, -1))
-        _locals = reversed_walker.gi_frame.f_locals
-        reversed_seg_i: int = len(self._segments) - _locals["segment_i"] - 1
+        end_segment_i, end_progress = self.walk_back(distance_to_end)
+        reversed_seg_i: int = len(self._segments) - end_segment_i - 1
         if reversed_seg_i < segment_i or (
-          reversed_seg_i == segment_i and segment_length - _locals["segment_progress"] < segment_progress
+          reversed_seg_i == segment_i and segment_length - end_progress < segment_progress
         ):
           yield None
           return
       
       wanted_progress, distance_to_end = yield last_pos
   
+  def walk_back(self, distance: float) -> tuple[int, float]:
+    """
+    Where a first step of 'distance' from the first point ends when walking the polygon backward.
+    Return the segment index and progress on the reversed polygon (like a :py:meth:`walk` on it would reach).
+    Segments nearer than 'distance' along the path can't reach this distance, so they are skipped with a binary search.
+    """
+    if distance <= self._lengths[-1]:
+      if distance == self._lengths[-1]:
+        return 1, 0
+      return 0, distance
+    
+    first_i: int = max(1, bisect_left(self._reversed_cumulative_lengths, distance) - 1)
+    reached = reach_segment(self._reversed_points, self._reversed_segments, self._reversed_points[0], self._reversed_segments[0], distance, first_i)
+    if reached is None:
+      return 0, 0
+    return reached[0], reached[2]
+  
   def bulk_walk(self, distances: list[float], distances_to_end: list[float]) -> tuple[Walker, list[Vector2|None]]:
     walker: Generator[Vector2, float, None] = self.walk()
     result: list[Vector2] = [next(walker)]
@@ -361,6 +457,9 @@ class Polygon:
     sizes: list[float] = [first_size, (yield positions[-1])]
     space_from: int = -1
     wanted_progress: float = sizes[-1] + spacing + sizes[-2]
+    # Placed positions, overlapping followers are closer than 2 * biggest + spacing
+    biggest: float = max(sizes)
+    grid: SpatialHash = SpatialHash((2*biggest + spacing) * (1 + 1e-9), positions)
     
     while True:
       if space_from == -1 and segment_progress + wanted_progress <= segment_length:
@@ -425,16 +524,30 @@ class Polygon:
           yield None
           return
       
-      for i in range(len(sizes) - (2 if space_from == -1 else 1)):
-        if i != space_from and (sizes[i] + spacing + sizes[-1])**2 > (positions[i] - positions[-1]).length_squared():
-          positions.pop()
-          space_from = i
-          wanted_progress = sizes[i] + spacing + sizes[-1]
-          break
+      # Only the first overlapping follower matters
+      checked_count: int = len(sizes) - (2 if space_from == -1 else 1)
+      overlapping: int|None = min(
+        (
+          i for i in grid.get_near(positions[-1])
+          if i < checked_count and i != space_from and (sizes[i] + spacing + sizes[-1])**2 > (positions[i] - positions[-1]).length_squared()
+        ),
+        default=None
+      )
+      if overlapping is not None:
+        positions.pop()
+        space_from = overlapping
+        wanted_progress = sizes[overlapping] + spacing + sizes[-1]
       else:
+        grid.add(len(positions) - 1, positions[-1])
         sizes.append((yield positions[-1]))
         wanted_progress = sizes[-1] + spacing + sizes[-2]
         space_from = -1
+        
+        if sizes[-1] > biggest:
+          biggest = sizes[-1]
+          if 2*biggest + spacing > grid.cell_size:
+            # Bigger cells are needed, grow them enough to not rebuild at each slightly bigger follower
+            grid = SpatialHash(max(2*biggest + spacing, 2*grid.cell_size) * (1 + 1e-9), positions)
   
   def bulk_walk_no_cross_overlap(self, spacing: float, sizes: list[float]) -> tuple[NoCrossOverlapWalker, list[Vector2|None]]:
     walker: Generator[Vector2, float, None] = self.walk_no_cross_overlap(spacing, sizes[0])
@@ -469,6 +582,52 @@ class Polygon:
     return self
 
 
+class GrowthCache:
+  """
+  Keep the least recently used grown polygons, keyed by the version of the base polygon (which changes at each bake),
+  the growth mode and the amount. The total number of points kept is bounded by 'max_points'.
+  Warning: Returned polygons are shared, do not modify them.
+  """
+  
+  def __init__(self, max_points: int = 100_000) -> None:
+    self.max_points: int = max_points
+    self.__polygons: OrderedDict[tuple[int, GrowthMode, float], Polygon] = OrderedDict()
+    self.__points: int = 0
+  
+  def get(self, polygon: Polygon, mode: GrowthMode, amount: float) -> Polygon:
+    """
+    :param mode: SCALE_FAST uses :py:meth:`Polygon.growed_to_inradius`, the others :py:meth:`Polygon.growed`
+    :param amount: the growth distance, or the inradius with SCALE_FAST
+    """
+    key = (polygon._version, mode, amount)
+    grown: Polygon|None = self.__polygons.get(key)
+    if grown is not None:
+      self.__polygons.move_to_end(key)
+      return grown
+    
+    match mode:
+      case GrowthMode.EXPAND_AND_MERGE:
+        grown = polygon.growed(amount, True)
+      case GrowthMode.EXPAND:
+        grown = polygon.growed(amount, False)
+      case GrowthMode.SCALE_FAST:
+        grown = polygon.growed_to_inradius(amount)
+    
+    self.__polygons[key] = grown
+    self.__points += len(grown.points)
+    while self.__points > self.max_points and len(self.__polygons) > 1:
+      self.__points -= len(self.__polygons.popitem(last=False)[1].points)
+    
+    return grown
+  
+  def clear(self) -> None:
+    self.__polygons.clear()
+    self.__points = 0
+
+
+GROWTH_CACHE = GrowthCache()
+
+
 class PolygonFollower:
   def __init__(self, pos: Vector2, size: float):
     self.pos: Vector2 = pos
@@ -482,7 +641,7 @@ class PolygonFollow:
     :param gap: minimum distance between rings
     :param max_angle: max angle each side, at back of the leader
     :param leader: the leader
-    :param cross_overlap: If True, non consecutive followers can overlap (like at intersections). If False, a slow algorithm prevent this.
+    :param cross_overlap: If True, non consecutive followers can overlap (like at intersections). If False, a slower algorithm prevent this.
     """
     self.leader: PolygonFollower = leader
     self.followers: list[PolygonFollower] = []
@@ -492,6 +651,7 @@ class PolygonFollow:
     self.polygon: Polygon = polygon
     self.cross_overlap: bool = cross_overlap
     self.growth_mode: GrowthMode = growth_mode
+    self.growth_cache: GrowthCache = GROWTH_CACHE
     
     self._debug_polygons: list[Polygon] = []
     
@@ -538,15 +698,13 @@ class PolygonFollow:
     def get_polygon() -> Polygon:
       if last_growed_polygon:
         match self.growth_mode:
-          case GrowthMode.EXPAND_AND_MERGE:
-            return last_growed_polygon.growed(last_growed_polygon_biggest + self.gap + biggest, True)
-          case GrowthMode.EXPAND:
-            return last_growed_polygon.growed(last_growed_polygon_biggest + self.gap + biggest, False)
+          case GrowthMode.EXPAND_AND_MERGE | GrowthMode.EXPAND:
+            return self.growth_cache.get(last_growed_polygon, self.growth_mode, last_growed_polygon_biggest + self.gap + biggest)
           case GrowthMode.SCALE_FAST:
             near, far = last_growed_polygon.get_near_far_fast()
-            return last_growed_polygon.growed_to_inradius(far + last_growed_polygon_biggest + self.gap + biggest)
+            return self.growth_cache.get(last_growed_polygon, GrowthMode.SCALE_FAST, far + last_growed_polygon_biggest + self.gap + biggest)
       else:
-        return self.polygon.growed_to_inradius(self.leader.size + self.gap + biggest)
+        return self.growth_cache.get(self.polygon, GrowthMode.SCALE_FAST, self.leader.size + self.gap + biggest)
     polygon: Polygon = get_polygon()
     walker: Walker|NoCrossOverlapWalker = polygon.walk() if self.cross_overlap else polygon.walk_no_cross_overlap(self.spacing, to_add[start_i])
     positions: list[Vector2] = [next(walker)]
@@ -593,12 +751,12 @@ class PolygonFollow:
         
         # Progress
         self._debug_polygons += [
-          polygon.growed(-biggest),
+          self.growth_cache.get(polygon, GrowthMode.EXPAND, -biggest),
           polygon,
-          polygon.growed(biggest),
+          self.growth_cache.get(polygon, GrowthMode.EXPAND, biggest),
         ]
         if self.growth_mode == GrowthMode.EXPAND_AND_MERGE:
-          self._debug_polygons.insert(-2, last_growed_polygon.growed(last_growed_polygon_biggest + self.gap + biggest, False) if last_growed_polygon else Polygon())
+          self._debug_polygons.insert(-2, self.growth_cache.get(last_growed_polygon, GrowthMode.EXPAND, last_growed_polygon_biggest + self.gap + biggest) if last_growed_polygon else Polygon())
         
         last_growed_polygon = polygon
         last_growed_polygon_biggest = biggest
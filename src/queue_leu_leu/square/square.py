@@ -1,16 +1,35 @@
 # You can use any other library that includes standard Vector things
 from pygame import Vector2
 import math
+import numpy as np
 
 
 SPEED_SCALE = 1 / 8
 
 
+def grid_offsets(count: int) -> np.ndarray:
+  """
+  Slots of 'count' followers in a square grid centered on the leader, in cells.
+  The grid is filled row by row, and the middle slot (the leader) is replaced by the next free slot.
+  """
+  side = math.isqrt(count) + 1 # == ceil(sqrt(count + 1)), without float errors
+  i = np.arange(count)
+  cx, cy = i % side, i // side
+
+  # Don't hog the middle spot
+  middle = side // 2 * (side + 1)
+  if side % 2 and middle < count:
+    cx[middle], cy[middle] = count % side, count // side
+
+  return np.stack((cx, cy), 1) - (side / 2 - 0.5)
+
+
 class SquareFollowRing:
   def __init__(self):
     self.angle = 0
     self.radius = 0
     self.sizes: list[float] = []
+    self.total = 0 # Running total of sizes where the ring stopped, to resume it when followers are appended
 
   def add_angle(self, degree: int):
     self.angle += math.radians(degree)
@@ -40,6 +59,11 @@ class SquareFollow:
     self.__last_speed = self.speed
     self.__last_distance = self.distance
     self.__total_size = 0
+    self.__cell = self.distance
+    # Caches
+    self.__offsets: np.ndarray|None = None
+    self.__offsets_key = None
+    self.__placed = 0 # Followers already in the rings
 
   def update_pos(self, new_pos: Vector2):
     """Update the position of the leader"""
@@ -54,33 +78,37 @@ class SquareFollow:
       self.rings[i].add_angle((self.speed if i % 2 else -self.speed) * SPEED_SCALE)
     
     # Update followers
-#    ii = 0
-#    
-#    for i, f in enumerate(self.followers):
-#      
-#      size = len(self.followers)
-#
-#      side = math.ceil(math.sqrt(size + 1));
-#      cx = i % side
-#      cy = i / side
-#
-#      #don't hog the middle spot
-#      if cx == side/2 and cy == side/2 and (side%2)==1:
-#        cx = size % side
-#        cy = size / side
-#      
-#      offset = Vector2(cx - (side/2 - 0.5), cy - (side/2 - 0.5))
-#      self.followers[ii].pos = self.leader.pos + offset * self.distance
-#      ii += 1
-
-  def adapt_rings(self):
-    """Recalculate the rings"""
-    ring = 0
-    total = 0
+    positions = self.get_offsets() + self.leader.pos
+    for follower, (x, y) in zip(self.followers, positions.tolist()):
+      follower.pos = Vector2(x, y)
+
+  def get_offsets(self) -> np.ndarray:
+    """Offsets of the followers from the leader, recalculated only when the follower count or cell size changes"""
+    key = (len(self.followers), self.__cell)
+    if key != self.__offsets_key:
+      self.__offsets = grid_offsets(len(self.followers)) * self.__cell
+      self.__offsets_key = key
+    return self.__offsets
+
+  def adapt_rings(self, append=False):
+    """
+    Recalculate the rings
+
+    :param append: when True, followers have only been appended since the last call,
+    so the last ring is resumed instead of recalculating everything
+    """
+    if append and self.rings:
+      ring = len(self.rings) - 1
+      total = self.rings[ring].total
+      first = self.__placed
+    else:
+      ring = 0
+      total = 0
+      first = 0
+      if ring < len(self.rings): self.__clear_ring(ring)
     circumference = math.tau * ((ring + 1) * self.radius)
-    if ring < len(self.rings): self.rings[ring].sizes.clear()
 
-    for i, f in enumerate(self.followers):
+    for f in self.followers[first:]:
       
       size = 2 * f.size + self.distance
       total += size
@@ -89,17 +117,24 @@ class SquareFollow:
         ring += 1
         circumference = math.tau * ((ring + 1) * self.radius)
         total = 0
-        if ring < len(self.rings): self.rings[ring].sizes.clear()
+        if ring < len(self.rings): self.__clear_ring(ring)
       
       if ring >= len(self.rings): self.rings.append(SquareFollowRing())
       self.rings[ring].sizes.append(size)
+      self.rings[ring].total = total
       #if size > self.rings[ring].radius: self.rings[ring].radius = size
     
     # Remove empty rings
     ring += 1
     for _ in range(len(self.rings) - ring):
       self.rings.pop(ring)
+    self.__placed = len(self.followers)
   
+  def __clear_ring(self, ring: int):
+    """Empty a ring before filling it again"""
+    self.rings[ring].sizes.clear()
+    self.rings[ring].total = 0
+
   def check_rings(self):
     """Recalculate the rings if .radius, .distance or a follower size has been changed"""
     total = sum(f.size for f in self.followers)
@@ -112,6 +147,8 @@ class SquareFollow:
       self.distance = max(self.distance, 0)
       self.__last_distance = self.distance
       self.__total_size = total
+      # Cells fit the biggest follower
+      self.__cell = 2 * max((f.size for f in self.followers), default=0) + self.distance
       self.adapt_rings()
     
     # Clamp the speed
@@ -122,7 +159,16 @@ class SquareFollow:
   def add_follower(self, follower: SquareFollowElement):
     """Add a new follower in the rings"""
     self.followers.append(follower)
-    self.check_rings()
+    if (self.__placed == len(self.followers) - 1 and
+        self.radius == self.__radius.x and
+        self.distance == self.__last_distance
+    ):
+      # Only the last ring can change, no need to check everything
+      self.__total_size += follower.size
+      self.__cell = max(self.__cell, 2 * follower.size + self.distance)
+      self.adapt_rings(True)
+    else:
+      self.check_rings()
 
   def pop_follower(self, index: int=-1):
     self.followers.pop(index)
@@ -12,7 +12,7 @@ class TrailFollowExample(TrailFollow):
 
     if debug:
       things = (
-        "Trail     "+str(len(self.trail)),
+        "Trail     "+str(len(self.history.points if self.history else self.trail)),
         "Followers "+str(fsize),
         "Distance  "+str(self.distance),
         "Leader    "+str(self.get_leader_index())
@@ -25,7 +25,7 @@ class TrailFollowExample(TrailFollow):
     pygame.draw.circle(window, (255, 0, 0), self.leader.pos, self.leader.size)
 
     if debug:
-      for p in self.trail:
+      for p in (self.history.points if self.history else self.trail):
         pygame.draw.circle(window, (255, 0, 0), p, 3)
 
   def handle_keyboard(self, keys):
@@ -1,5 +1,9 @@
 # You can use any other library that includes standard Vector things
 from pygame import Vector2
+import math
+from operator import attrgetter
+from weakref import WeakKeyDictionary
+import numpy as np
 
 
 class TrailFollowElement:
@@ -8,43 +12,382 @@ class TrailFollowElement:
     self.size = size
 
 
+def catmull_rom(p0: np.ndarray, p1: np.ndarray, p2: np.ndarray, p3: np.ndarray, u: np.ndarray) -> np.ndarray:
+  """
+  Points at parameters 'u' (from 0 to 1) of the centripetal Catmull-Rom segments from 'p1' to 'p2'.
+  Centripetal parametrization avoids loops and overshoots when points are unevenly spaced.
+  """
+  def knot(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    return np.maximum(np.sum((b - a)**2, -1, keepdims=True)**0.25, 1e-9)
+
+  t1 = knot(p0, p1)
+  t2 = t1 + knot(p1, p2)
+  t3 = t2 + knot(p2, p3)
+  t = t1 + np.asarray(u)[:, None] * (t2 - t1)
+
+  a1 = ((t1 - t) * p0 + t * p1) / t1
+  a2 = ((t2 - t) * p1 + (t - t1) * p2) / (t2 - t1)
+  a3 = ((t3 - t) * p2 + (t - t2) * p3) / (t3 - t2)
+  b1 = ((t2 - t) * a1 + t * a2) / t2
+  b2 = ((t3 - t) * a2 + (t - t1) * a3) / (t3 - t1)
+  return ((t2 - t) * b1 + (t - t1) * b2) / (t2 - t1)
+
+
+class TrailHistory:
+  def __init__(self, pos: Vector2, spacing: float=0, spline=False, resolution: int=8, tolerance: float=math.inf,
+               archive: str=None, hot_length: float=1000, compression: float=0):
+    """
+    Positions of a leader, recorded with their cumulative arc length.
+    Used to find the position at any distance behind the leader.
+    It can be shared by several formations following the same leader,
+    recording the same position again does nothing, so the path is recorded once per tick.
+
+    :param pos: the first position
+    :param spacing: minimum distance between recorded positions. The last position is always used,
+    but replaced by the next one until it's far enough from the previous recorded position.
+    :param spline: when True, positions are joined by a Catmull-Rom spline instead of lines,
+    so a bigger 'spacing' gives the same smoothness. The arc length is measured with a lookup table per segment.
+    :param resolution: number of samples in the lookup table of each segment, in spline mode
+    :param tolerance: a position closer than 'spacing' is recorded anyway when the path went farther than this distance
+    from a straight line, to keep turns accurate
+    :param archive: path of a file where positions older than 'hot_length' are moved instead of being dropped.
+    The file is memory-mapped, so only the parts sampled by followers are loaded. Not available in spline mode.
+    :param hot_length: length kept in memory behind the last position when there is an archive
+    :param compression: when not 0, straight runs are merged into single segments, with all merged positions
+    closer than this distance to the segment. 'spacing' and 'tolerance' are then ignored. Not available in spline mode.
+    """
+    if spline and archive: raise ValueError("archive is not available in spline mode")
+    if spline and compression: raise ValueError("compression is not available in spline mode")
+
+    self.spacing = spacing
+    self.tolerance = tolerance
+    self.spline = spline
+    self.resolution = resolution
+    self.__buffer = np.empty((16, 3)) # x, y and cumulative length. Only '__start' to '__live_end' is used
+    self.__buffer[0] = pos[0], pos[1], 0
+    # Cumulative lengths along the segment ending at each point, in spline mode
+    self.__lut = np.zeros((16, resolution + 1)) if spline else None
+    self.__samples = np.linspace(0, 1, resolution + 1)
+    self.__start = 0
+    self.__end = 1 # After the recorded positions
+    self.__live_end = 1 # After the last position, which can be not recorded yet
+    self.max_length = 0 # Length to keep behind the last position, older positions are dropped
+    self.__required: WeakKeyDictionary[object, float] = WeakKeyDictionary()
+    self.__archive_path = archive
+    self.__archive: np.memmap|None = None
+    self.__archived = 0
+    self.hot_length = hot_length
+    if archive: self.__map_archive(1024)
+    self.compression = compression
+    # Directions (relative to '__cone_ref') of the segments from the last recorded position
+    # that stay close enough to all positions since it
+    self.__cone_ref: float|None = None
+    self.__cone = -math.inf, math.inf
+
+  @property
+  def points(self) -> np.ndarray:
+    """Read-only: The positions (a view), the last one is the newest"""
+    return self.__buffer[self.__start:self.__live_end, :2]
+
+  @property
+  def length(self) -> float:
+    """Total length recorded since the beginning"""
+    return self.__buffer[self.__live_end - 1, 2]
+
+  def require(self, owner: object, length: float):
+    """Set the length needed behind the last position by an 'owner', 'max_length' is the biggest one"""
+    self.__required[owner] = length
+    self.max_length = max(self.__required.values())
+
+  def release(self, owner: object):
+    """Remove the length needed by an 'owner'"""
+    self.__required.pop(owner, None)
+    self.max_length = max(self.__required.values(), default=0)
+
+  def record(self, pos: Vector2):
+    """Add a new position, ignored if it's the same as the last one"""
+    buffer = self.__buffer
+    last = buffer[self.__live_end - 1]
+    if last[0] == pos[0] and last[1] == pos[1]: return
+
+    # Old positions are only dropped now, once every owner sharing this history
+    # had the opportunity to update its requirement and sample the previous tick
+    self.__drop_old()
+    if self.__end + 3 > len(buffer):
+      self.__make_room()
+      buffer = self.__buffer
+    if self.compression:
+      if self.__live_end > self.__end and (not self.__in_cone(pos) or self.__get_slack(pos) > self.compression):
+        self.__end += 1 # The path turns or goes back, keep the previous position
+        self.__cone_ref, self.__cone = None, (-math.inf, math.inf)
+    elif self.__live_end > self.__end and self.__get_deviation(pos) > self.tolerance:
+      self.__end += 1 # The path turns, keep the previous position
+    x, y, length = buffer[self.__end - 1]
+    step = np.hypot(pos[0] - x, pos[1] - y)
+
+    if not step:
+      self.__live_end = self.__end # Back on the last recorded position
+    elif self.compression:
+      self.__narrow_cone(pos[0] - x, pos[1] - y, step)
+      if self.__live_end > self.__end: # Keep the length along the real path, not along the merged segment
+        x, y, length = buffer[self.__end]
+        step = np.hypot(pos[0] - x, pos[1] - y)
+      buffer[self.__end] = pos[0], pos[1], length + step
+      self.__live_end = self.__end + 1
+    else:
+      buffer[self.__end] = pos[0], pos[1], length + step
+      if step >= self.spacing: self.__end += 1
+      self.__live_end = self.__end + (step < self.spacing)
+
+    if self.spline:
+      # Only the last segments can have a new neighbor
+      for i in range(max(self.__start + 1, self.__end - 2), self.__live_end):
+        self.__bake_segment(i)
+
+  def __drop_old(self):
+    """
+    Drop (or archive) positions that are too old, but keep one beyond the kept length to interpolate with
+    (and one more for the spline shape)
+    """
+    buffer = self.__buffer
+    kept = self.hot_length if self.__archive is not None else self.max_length
+    lengths = buffer[self.__start:self.__live_end, 2]
+    dropped = np.searchsorted(lengths, lengths[-1] - kept, "right") - (2 if self.spline else 1)
+    if dropped > 0:
+      start = min(self.__start + int(dropped), self.__end - 1)
+      if self.__archive is not None: self.__archive_rows(buffer[self.__start:start])
+      self.__start = start
+
+  def position_at(self, distance_behind: float) -> Vector2:
+    """Get the position at a distance (along the path) behind the last position"""
+    return Vector2(*self.positions_at(np.array([distance_behind]))[0])
+
+  def positions_at(self, distances_behind: np.ndarray) -> np.ndarray:
+    """
+    Vectorized version of :py:meth:`position_at`.
+    Positions before the oldest point are extrapolated, like the grid trail does.
+    """
+    live = self.__buffer[self.__start:self.__live_end]
+    targets = live[-1, 2] - np.asarray(distances_behind, dtype=float)
+    if self.__archived:
+      cold = targets < live[0, 2]
+      if cold.any():
+        positions = np.empty((len(targets), 2))
+        positions[cold] = self.__archive_at(targets[cold], live[0])
+        positions[~cold] = self.positions_at(live[-1, 2] - targets[~cold])
+        return positions
+    if len(live) == 1: return np.repeat(live[:, :2], len(targets), 0)
+
+    i = np.clip(np.searchsorted(live[:, 2], targets), 1, len(live) - 1)
+    starts, ends = live[i - 1], live[i]
+    if self.spline: return self.__spline_at(self.__start + i, targets - starts[:, 2])
+
+    progress = np.minimum((targets - starts[:, 2]) / (ends[:, 2] - starts[:, 2]), 1)[:, None]
+    return starts[:, :2] + (ends[:, :2] - starts[:, :2]) * progress
+
+  def close(self):
+    """
+    Close the archive file, if any.
+    Archived positions are not available anymore, so positions before the ones in memory are extrapolated,
+    and positions are then dropped after 'max_length' like without archive.
+    """
+    if self.__archive is not None:
+      self.__archive.flush()
+      self.__archive = None
+      self.__archived = 0
+
+  def __map_archive(self, capacity: int):
+    """(Re)open the archive file with room for 'capacity' positions"""
+    if self.__archive is None:
+      mode = "w+"
+    else:
+      self.__archive.flush()
+      mode = "r+"
+    self.__archive = np.memmap(self.__archive_path, float, mode, shape=(capacity, 3))
+
+  def __archive_rows(self, rows: np.ndarray):
+    """Append old positions to the archive"""
+    count = self.__archived + len(rows)
+    if count > len(self.__archive):
+      capacity = len(self.__archive)
+      while count > capacity: capacity *= 2
+      self.__map_archive(capacity)
+    self.__archive[self.__archived:count] = rows
+    self.__archived = count
+
+  def __archive_at(self, targets: np.ndarray, first_live: np.ndarray) -> np.ndarray:
+    """Positions at cumulative lengths 'targets', older than the first position in memory"""
+    archive = self.__archive[:self.__archived]
+    # A binary search only loads a few pages of the file
+    i = np.searchsorted(archive[:, 2], targets)
+    starts = archive[np.maximum(i - 1, 0)]
+    ends = np.where((i < len(archive))[:, None], archive[np.minimum(i, len(archive) - 1)], first_live)
+    # Before the oldest position, extrapolate along the first segment
+    i0 = i == 0
+    starts[i0], ends[i0] = archive[0], archive[1] if len(archive) > 1 else first_live
+
+    progress = (targets - starts[:, 2]) / (ends[:, 2] - starts[:, 2])
+    return starts[:, :2] + (ends[:, :2] - starts[:, :2]) * progress[:, None]
+
+  def __in_cone(self, pos: Vector2) -> bool:
+    """Whether the segment from the last recorded position to 'pos' stays close to all the merged positions"""
+    if self.__cone_ref is None: return True
+    x, y = self.__buffer[self.__end - 1, :2]
+    angle = (math.atan2(pos[1] - y, pos[0] - x) - self.__cone_ref + math.pi) % math.tau - math.pi
+    return self.__cone[0] <= angle <= self.__cone[1]
+
+  def __narrow_cone(self, dx: float, dy: float, distance: float):
+    """Keep only the directions passing close enough to a new position"""
+    if distance <= self.compression: return # Close to any segment from the last recorded position
+    angle = math.atan2(dy, dx)
+    if self.__cone_ref is None: self.__cone_ref = angle
+    angle = (angle - self.__cone_ref + math.pi) % math.tau - math.pi
+    half = math.asin(self.compression / distance)
+    self.__cone = max(self.__cone[0], angle - half), min(self.__cone[1], angle + half)
+
+  def __get_slack(self, pos: Vector2) -> float:
+    """How much longer the real path from the last recorded position to 'pos' is than the merged segment"""
+    (x0, y0, length0), (x1, y1, length1) = self.__buffer[self.__end - 1:self.__end + 1]
+    return length1 + math.hypot(pos[0] - x1, pos[1] - y1) - length0 - math.hypot(pos[0] - x0, pos[1] - y0)
+
+  def __get_deviation(self, pos: Vector2) -> float:
+    """Distance from the not recorded position to the line between the last recorded position and 'pos'"""
+    (x0, y0), (x1, y1) = self.__buffer[self.__end - 1:self.__end + 1, :2]
+    dx, dy = pos[0] - x0, pos[1] - y0
+    length = dx*dx + dy*dy
+    progress = min(max(((x1-x0)*dx + (y1-y0)*dy) / length, 0), 1) if length else 0
+    return math.hypot(x1 - x0 - dx*progress, y1 - y0 - dy*progress)
+
+  def __get_segments(self, i: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Control points of the spline segments ending at 'i', missing neighbors are mirrored"""
+    points = self.__buffer[:, :2]
+    p1, p2 = points[i - 1], points[i]
+    p0 = np.where((i - 2 >= self.__start)[:, None], points[np.maximum(i - 2, 0)], 2*p1 - p2)
+    p3 = np.where((i + 1 < self.__live_end)[:, None], points[np.minimum(i + 1, len(points) - 1)], 2*p2 - p1)
+    return p0, p1, p2, p3
+
+  def __bake_segment(self, i: int):
+    """Update the lookup table of the spline segment ending at 'i', and the length at 'i'"""
+    samples = catmull_rom(*self.__get_segments(np.array([i])), self.__samples)
+    lut = self.__lut[i]
+    lut[0] = 0
+    np.cumsum(np.hypot(*np.diff(samples, axis=0).T), out=lut[1:])
+    self.__buffer[i, 2] = self.__buffer[i - 1, 2] + lut[-1]
+
+  def __spline_at(self, i: np.ndarray, local: np.ndarray) -> np.ndarray:
+    """Positions at 'local' lengths along the spline segments ending at 'i'"""
+    lut = self.__lut[i]
+    rows = np.arange(len(i))
+    j = np.clip((lut < local[:, None]).sum(1), 1, self.resolution)
+    low, high = lut[rows, j - 1], lut[rows, j]
+    progress = np.divide(local - low, high - low, out=np.zeros_like(local), where=high > low)
+    p0, p1, p2, p3 = self.__get_segments(i)
+    positions = catmull_rom(p0, p1, p2, p3, np.minimum((j - 1 + progress) / self.resolution, 1))
+
+    # Before the oldest point, extrapolate along the first segment
+    outside = local < 0
+    if outside.any():
+      chord = (p2 - p1)[outside]
+      positions[outside] = p1[outside] + chord * (local[outside] / lut[outside, -1])[:, None]
+    return positions
+
+  def __make_room(self):
+    """Move live positions at the beginning of the buffer, or grow it if it's more than half used"""
+    size = self.__live_end - self.__start
+    grow = size + 2 > len(self.__buffer) // 2
+    buffer = np.empty((2 * len(self.__buffer), 3)) if grow else self.__buffer
+    buffer[:size] = self.__buffer[self.__start:self.__live_end]
+    self.__buffer = buffer
+    if self.spline:
+      lut = np.empty((len(buffer), self.resolution + 1)) if grow else self.__lut
+      lut[:size] = self.__lut[self.__start:self.__live_end]
+      self.__lut = lut
+    self.__end -= self.__start
+    self.__live_end = size
+    self.__start = 0
+
+
 class TrailFollow:
-  def __init__(self, distance: float, leader: TrailFollowElement, precise=False, elastic=False):
+  def __init__(self, distance: float, leader: TrailFollowElement, precise=False, elastic=False, arc_length=False,
+               history: TrailHistory=None, offset: float=0, spline=False, compression: float=0, archive: str=None,
+               spline_tolerance: float=0.5):
     """
     :param distance: distance between each followers (must never be less than 1)
     :param leader: the leader
     :param precise: when True, a lerp is performed between points to get a smooth movement
     :param elastic: when True, the trail points will gradually reach the leader point. 
     So 'distance' become 'speed'.
+    :param arc_length: when True, leader positions are recorded with their arc length in a :py:class:`TrailHistory`,
+    and followers are placed at their distance along it. Changing 'distance' or sizes doesn't rebuild anything.
+    :param history: a :py:class:`TrailHistory` shared with other formations following the same leader (implies 'arc_length')
+    :param offset: extra distance between the leader and the first follower, in arc length mode
+    :param spline: when True, the history is a Catmull-Rom spline through positions recorded every 8 'distance' (implies 'arc_length')
+    :param spline_tolerance: in spline mode, positions are recorded sooner when the path went farther than this distance
+    from a straight line
+    :param compression: when not 0, straight parts of the path are merged into single segments,
+    staying closer than this distance to the real path (implies 'arc_length')
+    :param archive: path of a file where old positions are moved, see :py:class:`TrailHistory` (implies 'arc_length')
     
     Note: the elastic effect is already precise, so 'precise' will be always False.
+    Note: the arc length mode is always precise, so 'precise' and 'elastic' are ignored.
     """
     self.leader = leader
     self.followers: list[TrailFollowElement] = []
-    self.trail = [self.leader.pos]
+    self.__buffer = np.empty((16, 2)) # Circular, only the first '__length' points are used
+    self.__buffer[0] = self.leader.pos
+    self.__length = 1
     self.distance = distance
     self.__last_distance = self.distance
     self.__total_size = 0
+    self.__trail_size = 0 # Sum of the sizes of followers in the trail, see get_total_size()
     self.__i = 0
+    self.__offsets: np.ndarray|None = None
+    self.__offsets_key = None
+    self.__sizes: np.ndarray|None = None
+    self.history: TrailHistory|None = history
+    self.offset = offset
+    self.__spline = spline and history is None # The spacing of the history follows 'distance'
 
+    if arc_length or history or spline or compression or archive:
+      if history is None:
+        if spline:
+          self.history = TrailHistory(self.leader.pos, 8 * self.get_distance(), True, tolerance=spline_tolerance, archive=archive)
+        else:
+          self.history = TrailHistory(self.leader.pos, archive=archive, compression=compression)
+      self.update_pos = self.update_pos_arc_length
+      self.positions_at = self.history.positions_at
+      elastic = False
+      precise = True # only to get offsets in distance
     if elastic:
       self.update_pos = self.update_pos_elastic
       precise = False # disable this to avoid trail problems
-    if precise:
+    if precise and self.history is None:
       self.update_trail = self.update_trail_precise
       self.get_size = self.get_size_precise
+    self.__precise = precise
+
+  @property
+  def trail(self) -> np.ndarray:
+    """Read-only: The points of the trail (a view of the circular buffer)"""
+    return self.__buffer[:self.__length]
 
   def update_pos(self, new_pos: Vector2):
     """Update the position of the leader"""
     self.check_trail()
 
     self.leader.pos = new_pos
-    current_pos = self.trail[self.__i]
+    trail = self.trail
+    head = Vector2(*trail[self.__i])
+    gap = head.distance_to(new_pos)
+    steps = int(gap // self.get_distance())
 
-    while self.trail[self.__i].distance_to(new_pos) >= self.get_distance():
-      current_pos = current_pos.move_towards(new_pos, self.get_distance())
-      self.__i = self._wrapped(self.__i - 1)
-      self.trail[self.__i] = current_pos
+    if steps:
+      # Add a point every 'distance' towards the leader, in one go.
+      # Only the last ones are written, older would be overwritten by newer anyway.
+      k = np.arange(max(steps - self.__length, 0) + 1, steps + 1)
+      direction = (new_pos - head) / gap
+      trail[(self.__i - k) % self.__length] = np.add(head, np.multiply.outer(k * self.get_distance(), direction))
+      self.__i = self._wrapped(self.__i - steps)
 
     self.update_trail()
 
@@ -52,54 +395,111 @@ class TrailFollow:
     self.check_trail()
 
     self.leader.pos = new_pos
-    current_pos = self.trail[self.__i].move_towards(new_pos, self.get_distance())
+    current_pos = Vector2(*self.trail[self.__i]).move_towards(new_pos, self.get_distance())
     self.__i = self._wrapped(self.__i - 1)
-    self.trail[self.__i] = current_pos
+    self.trail[self.__i] = current_pos.x, current_pos.y
 
     self.update_trail()
 
+  def update_pos_arc_length(self, new_pos: Vector2):
+    self.check_trail()
+
+    self.leader.pos = new_pos
+    distances = self.__require_history()
+    self.history.record(new_pos)
+
+    if distances is not None:
+      self._place_followers(self.history.positions_at(distances))
+
+  def __require_history(self) -> np.ndarray|None:
+    """Update the length the history must keep for this formation, and get the distances of the followers"""
+    if not self.followers:
+      self.history.release(self)
+      return None
+    distances = self.offset + self.leader.size + self.get_distance() + self.get_offsets()
+    self.history.require(self, distances[-1] + self.followers[-1].size)
+    return distances
+
   def update_trail(self):
     """Update the trail"""
-    i = self.__i + self.get_size(self.leader)/2
-    tsize = len(self.trail)
-
-    for follower in self.followers:
-      size = self.get_size(follower)/2
-      i += size
-      follower.pos = self.trail[self._wrapped(int(i % tsize))]
-      i += size
+    if not self.followers: return
+    tsize = self.__length
+    indices = ((self.__i + self.get_offsets()) % tsize).astype(int) % tsize
+    self._place_followers(self.trail[indices])
 
   def update_trail_precise(self):
-    i = self.leader.size + self.get_distance() - self.leader.pos.distance_to(self.trail[self.__i])
-    tsize = len(self.trail)
-
-    for follower in self.followers:
-      i += follower.size
-      offset = self.__i + i / self.get_distance()
-      follower.pos = Vector2.lerp(  # vvv equivalent of ceil()
-        self.trail[self._wrapped(int(-(-(offset % tsize)//1)))],
-        self.trail[self._wrapped(int(offset % tsize))] if i >= 0 else self.leader.pos,
-        1 - (offset % 1)
-      )
-      i += follower.size + self.get_distance()
+    if not self.followers: return
+    self._place_followers(self.positions_at(self.leader.size + self.get_distance() + self.get_offsets()))
+
+  def position_at(self, distance_behind: float) -> Vector2:
+    """Get the position on the trail at a distance behind the leader"""
+    return Vector2(*self.positions_at(np.array([distance_behind]))[0])
+
+  def positions_at(self, distances_behind: np.ndarray) -> np.ndarray:
+    """Vectorized version of :py:meth:`position_at`"""
+    trail = self.trail
+    tsize = self.__length
+    # Distances from the newest trail point
+    i = np.asarray(distances_behind, dtype=float) - self.leader.pos.distance_to(trail[self.__i])
+    offsets = self.__i + i / self.get_distance()
+
+    starts = trail[np.ceil(offsets % tsize).astype(int) % tsize]
+    ends = trail[(offsets % tsize).astype(int) % tsize]
+    ends[i < 0] = self.leader.pos
+    progress = (1 - offsets % 1)[:, None]
+    # Same formula as Vector2.lerp()
+    return starts * (1 - progress) + ends * progress
+
+  def get_offsets(self) -> np.ndarray:
+    """
+    Get the offset of each follower from the leader, as a prefix sum of their sizes.
+    In trail points (from the leader index), or in distance (from the leader) when precise.
+    Only recalculated when sizes or distance change.
+    """
+    sizes = np.fromiter(map(attrgetter("size"), self.followers), float, len(self.followers))
+    key = (self.leader.size, self.get_distance())
+    if self.__offsets is None or self.__offsets_key != key or not np.array_equal(self.__sizes, sizes):
+      self.__offsets_key = key
+      self.__sizes = sizes
+
+      if self.__precise:
+        # Each follower is after the sizes of previous followers, and a distance between each
+        before = np.cumsum(2 * sizes + self.get_distance()) - 2 * sizes - self.get_distance()
+        self.__offsets = before + sizes
+      else:
+        # Same as get_size() for every follower
+        sizes = np.trunc((sizes + self.get_distance()) / self.get_distance() * 2) / 2
+        self.__offsets = self.get_size(self.leader)/2 + 2 * np.cumsum(sizes) - sizes
+    return self.__offsets
+
+  def _place_followers(self, positions: np.ndarray):
+    for follower, (x, y) in zip(self.followers, positions.tolist()):
+      follower.pos = Vector2(x, y)
 
   def check_trail(self):
     """Recalculate the trail if .distance or a follower size has been changed"""
     total = sum(f.size for f in self.followers)
     if self.get_distance() != self.__last_distance or total != self.__total_size:
       self.__last_distance = self.get_distance()
+      if self.__spline: self.history.spacing = 8 * self.get_distance()
       self.__total_size = total
+      self.__trail_size = sum(map(self.get_size, self.followers))
       self.adapt_trail()
 
   def add_follower(self, follower: TrailFollowElement):
     """Add a new follower in the trail"""
     self.followers.append(follower)
     self.__total_size += follower.size
+    self.__trail_size += self.get_size(follower)
     self.adapt_trail()
 
   def pop_follower(self, index: int=-1):
     removed = self.followers.pop(index)
     self.__total_size -= removed.size
+    if self.get_size == self.get_size_precise:
+      self.__trail_size = sum(map(self.get_size, self.followers)) # Subtracting float sizes would drift
+    else:
+      self.__trail_size -= self.get_size(removed)
     self.adapt_trail()
 
   def remove_follower(self, follower: TrailFollowElement):
@@ -111,10 +511,15 @@ class TrailFollow:
     Automatically adapt the trail. \n
     Must be used instead of .increase_trail() and .decrease_trail().
     """
-    delta = self.get_total_size() + 1 - len(self.trail)
+    self.__offsets = None
+    if self.history is not None:
+      # Required now, the history can be recorded by another formation before the next update of this one
+      self.__require_history()
+      return
+    delta = self.get_total_size() + 1 - self.__length
 
     if delta > 0:
-      away_from = self.trail[self._wrapped(self.__i - 2)] if len(self.trail) > 1 else self.leader.pos
+      away_from = self.trail[self._wrapped(self.__i - 2)] if self.__length > 1 else self.leader.pos
       self.increase_trail(self.__i, delta, self.trail[self._wrapped(self.__i - 1)], away_from)
     elif delta < 0: self.decrease_trail(-delta)
 
@@ -123,20 +528,37 @@ class TrailFollow:
     Increase the trail 'at' an index, of an 'amount' of points with a dest 'position'
     and an 'await_from' position.
     """
-    if self.__i >= at: self.__i += amount
-    offset = position - away_from
+    # Accumulate offsets in order, like repeated additions
+    steps = np.empty((amount + 1, 2))
+    steps[0] = position
+    steps[1:] = np.subtract(position, away_from)
+    points = np.cumsum(steps, axis=0)[1:]
 
-    for i in range(amount):
-      position = position + offset
-      self.trail.insert(at+i, position)
+    if at % self.__length:
+      # Rotate the trail so that 'at' becomes its end (the same place in the cycle),
+      # then the next insertions there don't move any point
+      self.__buffer[:self.__length] = np.roll(self.trail, -at, 0)
+      self.__i = (self.__i - at) % self.__length
+    self.reserve(self.__length + amount)
+    self.__buffer[self.__length:self.__length+amount] = points
+    self.__length += amount
 
   def decrease_trail(self, amount: int):
     """Remove an 'amount' of points at end of the trail"""
-    self.trail = [
-      self.trail[i] for i in range(self.__i - len(self.trail), self.__i - amount)
-    ]
+    kept = self.__length - amount
+    self.__buffer[:kept] = self.__buffer[np.arange(self.__i, self.__i + kept) % self.__length]
+    self.__length = kept
     self.__i = 0
 
+  def reserve(self, size: int):
+    """Make sure the buffer can hold 'size' points, growing it geometrically"""
+    capacity = len(self.__buffer)
+    if size > capacity:
+      while size > capacity: capacity *= 2
+      buffer = np.empty((capacity, 2))
+      buffer[:self.__length] = self.trail
+      self.__buffer = buffer
+
   def get_size(self, follower: TrailFollowElement) -> int:
     """Get the size of a follower (in the trail)"""
     return int((follower.size + self.get_distance()) / self.get_distance() * 2)
@@ -151,7 +573,7 @@ class TrailFollow:
 
   def get_total_size(self) -> int:
     """Get the total size of the trail"""
-    return int(self.get_size(self.leader) + sum(map(lambda f: self.get_size(f), self.followers)))
+    return int(self.get_size(self.leader) + self.__trail_size)
 
   def get_leader_index(self):
     """Get the leader index in the trail"""
@@ -159,4 +581,4 @@ class TrailFollow:
 
   def _wrapped(self, i: int) -> int:
     """Cyclic index of the trail"""
-    return i % len(self.trail)
+    return i % self.__length